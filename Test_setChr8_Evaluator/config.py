@@ -18,6 +18,10 @@ else:
     EVALUATOR_DATA_DIR = os.path.join(SCRIPT_DIR, "evaluator_data")
 
 EVALUATOR_INPUT_PATH = os.path.join(EVALUATOR_DATA_DIR, input_file)
+
+# Skip the per-key duplicate-detection hook when the input file is one this
+# repo generated itself (set False when accepting hand-edited JSON)
+EVALUATOR_TRUST_INPUT = False
 output_filename_base = f'{EVALUATOR_NAME}_predictions_{input_file.replace(".json", "")}'
 
 # Debug logs for validation
@@ -31,6 +35,10 @@ REQUEST_FORMAT = REQUEST_FORMAT.lower()
 RESPONSE_FORMAT = "application/msgpack-numpy"
 RESPONSE_FORMAT = RESPONSE_FORMAT.lower()
 
+# Reinstall msgpack_numpy's global msgpack patch (legacy behaviour); the
+# content handler now passes the numpy hooks explicitly where needed
+USE_LEGACY_MSGPACK_NUMPY = False
+
 # HTTP request retry
 MAX_RETRIES = 50
 RETRY_INTERVAL = 30 # Seconds to wait between each retry attempt
\ No newline at end of file
@@ -3,13 +3,15 @@
 import os
 import sys
 import json
+import shutil
 from requests.exceptions import RequestException, HTTPError
 
 import config
 from data_loader import load_and_validate_data
-from evaluator_content_handler import negotiate_formats, get_predictions, deserialize_response
+from evaluator_content_handler import negotiate_formats, get_predictions, deserialize_response, deserialize_msgpack_file
 import evaluator_metrics_calculator
 import msgpack
+import msgpack_numpy as m
 
 def run_evaluator(predictor_ip, predictor_port, output_dir):
     """
@@ -28,26 +30,41 @@ def run_evaluator(predictor_ip, predictor_port, output_dir):
     total_sequences = len(data_dict["sequences"])
 
     predictor_url = f"http://{predictor_ip}:{predictor_port}"
+    response = None
     response_payload = None
     is_success_response = False
     resp_fmt = None  # negotiated response MIME type
+    raw_msgpack_path = None  # set when the raw body was streamed to disk
 
     try:
         # ---- 1) Negotiate wire formats with predictor (/formats) ----
-        req_fmt, resp_fmt = negotiate_formats(predictor_url)
+        req_fmt, resp_fmt, content_enc = negotiate_formats(predictor_url)
 
         # req_fmt: what we will send (e.g. application/json or application/msgpack)
         # resp_fmt: what we expect back (e.g. application/msgpack or application/json)
+        # content_enc: request body Content-Encoding ("blosc2" or None)
 
         # ---- 2) Send prediction request (/predict) ----
-        response = get_predictions(predictor_url, data_dict, req_fmt, resp_fmt)
+        response = get_predictions(predictor_url, data_dict, req_fmt, resp_fmt, content_enc)
 
         # If we got here, requests.raise_for_status() did NOT raise HTTPError
         is_success_response = True
         print("Predictor returned 200 OK.")
 
         # ---- 3) Decode response in negotiated format ----
-        response_payload = deserialize_response(response, resp_fmt)
+        if response.headers.get("Content-Type", "").lower() == "application/msgpack-numpy":
+            # Stream the raw body straight to disk, then decode from the
+            # file: the bytes on disk are exactly the artifact we save
+            # later, so the payload is never re-serialized
+            raw_msgpack_path = os.path.join(
+                output_dir, f"{config.output_filename_base}.msgpack.part")
+            response.raw.decode_content = True
+            with open(raw_msgpack_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f)
+            print(f"Streamed raw response body to {raw_msgpack_path}")
+            response_payload = deserialize_msgpack_file(raw_msgpack_path)
+        else:
+            response_payload = deserialize_response(response, resp_fmt)
 
     except HTTPError as http_err:
         # HTTP 4xx/5xx: treat as error response from predictor
@@ -105,16 +122,20 @@ def run_evaluator(predictor_ip, predictor_port, output_dir):
                 f"Warning: Task {i} ('{task.get('name')}') has {n_preds} predictions, "
                 f"but {total_sequences} sequences were sent to the Predictor."
             )
-    response_fmt_actual = response.headers.get("Content-Type","").lower()
+    response_fmt_actual = response.headers.get("Content-Type","").lower() if response is not None else ""
     if response_fmt_actual == "application/msgpack-numpy":
         print("Saving Predictor response as .msgpack")
         #The only way to save msgpacks with numpys in them is to save as msgpack file
         try:
-            with open(saved_predictions_path_msgpack, 'wb') as f:
-                msgpack.dump(response_payload, f, use_bin_type=True)
-            print(f"Raw predictions saved to {saved_predictions_path}")
-        except IOError as e:
-            print(f"FATAL: Could not save predictions to {saved_predictions_path}. {e}", file=sys.stderr)
+            if raw_msgpack_path is not None:
+                # The body was already streamed to disk; just move it into place
+                os.replace(raw_msgpack_path, saved_predictions_path_msgpack)
+            else:
+                with open(saved_predictions_path_msgpack, 'wb') as f:
+                    msgpack.dump(response_payload, f, use_bin_type=True, default=m.encode)
+            print(f"Raw predictions saved to {saved_predictions_path_msgpack}")
+        except (IOError, OSError) as e:
+            print(f"FATAL: Could not save predictions to {saved_predictions_path_msgpack}. {e}", file=sys.stderr)
             return
     else:
         try:
@@ -1,10 +1,15 @@
-#tweak this file to make the .json coordinates file for other chromosomes
-import json
+#tweak this file to make the coordinates file for other chromosomes
+import msgspec
+import pysam
 # Parameters
 chrom = "chr8"
-chrom_length = 145138636  # GRCh38 length
 segment_size = 1_000_000
 
+# Read the chromosome length from the FASTA index instead of hardcoding it,
+# so the segments always match the genome build actually in use
+FASTA_PATH = "/orca/resources/Homo_sapiens.GRCh38.dna.primary_assembly.fa"
+chrom_length = pysam.FastaFile(FASTA_PATH).get_reference_length(chrom)
+
 # Build sequence_coordinates as a flat dict
 sequence_coordinates = {}
 for i, start in enumerate(range(0, chrom_length - segment_size, segment_size), 1):
@@ -27,8 +32,9 @@ request_payload = {
     "sequence_coordinates": sequence_coordinates
 }
 
-# Write to JSON file
-with open("/scratch/st-cdeboer-1/iluthra/game_apis/final_APIs/predictors/Orca_final/evaluator_data/chr8_sequence_coordinates.json", "w") as f:
-    json.dump(request_payload, f, indent=2)
+# Write as a binary msgpack artifact: compact, fast to load, and no
+# duplicate-key risk since this producer is authoritative
+with open("/scratch/st-cdeboer-1/iluthra/game_apis/final_APIs/predictors/Orca_final/evaluator_data/chr8_sequence_coordinates.msgpack", "wb") as f:
+    f.write(msgspec.msgpack.encode(request_payload))
 
-print(f"Wrote {len(sequence_coordinates)} sequence segments to chr8_sequence_coordinates.json")
\ No newline at end of file
+print(f"Wrote {len(sequence_coordinates)} sequence segments to chr8_sequence_coordinates.msgpack")
\ No newline at end of file
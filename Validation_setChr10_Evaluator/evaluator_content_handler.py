@@ -1,16 +1,64 @@
 '''POST Request with Retry Loop and Deserialize Response in Negotiated MIME Type'''
 
+import os
 import sys
 import time
-import tqdm
 import json
+import functools
 import msgpack
+import msgspec
+import numpy as np
+import blosc2
 import requests
 import config
+from data_loader import encode_seq
 
-#this patch allows the mspgpack-numpy
+# msgpack_numpy's global patch routes every msgpack encode/decode through
+# Python-level hooks (and copies each array via tobytes()); the numpy
+# decode hook is now passed explicitly where it is needed, so the patch is
+# only installed when the legacy behaviour is requested in config
 import msgpack_numpy as m
-m.patch()
+if config.USE_LEGACY_MSGPACK_NUMPY:
+    m.patch()
+
+# --- msgspec-based msgpack codec -------------------------------------------
+# numpy arrays ride in an ExtType (code 1) carrying (dtype, shape, buffer):
+# encoding reuses the array's own buffer (no tobytes() copy) and decoding is
+# a single np.frombuffer. This replaces msgpack.packb + the msgpack_numpy
+# hooks on the request path, which paid Python-level dispatch per item.
+
+class NDArrayRep(msgspec.Struct, gc=False, array_like=True):
+    """Wire representation of a numpy array inside an msgpack ExtType."""
+    dtype: str
+    shape: tuple
+    data: bytes
+
+_NDARRAY_EXT_CODE = 1
+_rep_encoder = msgspec.msgpack.Encoder()
+_rep_decoder = msgspec.msgpack.Decoder(NDArrayRep)
+
+def _encode_hook(obj):
+    if isinstance(obj, np.ndarray):
+        return msgspec.msgpack.Ext(
+            _NDARRAY_EXT_CODE,
+            _rep_encoder.encode(NDArrayRep(obj.dtype.str, obj.shape, obj.data))
+        )
+    raise NotImplementedError(f"Cannot serialize object of type {type(obj)}")
+
+def _ext_hook(code, data):
+    if code == _NDARRAY_EXT_CODE:
+        rep = _rep_decoder.decode(data)
+        return np.frombuffer(rep.data, dtype=rep.dtype).reshape(rep.shape)
+    # Unknown extension: hand it back untouched
+    return msgspec.msgpack.Ext(code, data)
+
+_msgpack_encoder = msgspec.msgpack.Encoder(enc_hook=_encode_hook)
+_msgpack_decoder = msgspec.msgpack.Decoder(ext_hook=_ext_hook)
+
+# Reused send buffer: encode_into() serializes straight into this bytearray,
+# so posting does not allocate a fresh 100+ MB bytes object per request.
+_SEND_BUF = bytearray()
+# ---------------------------------------------------------------------------
 
 def _make_request_with_retry(http_method, url, **kwargs):
     """
@@ -39,12 +87,7 @@ def _make_request_with_retry(http_method, url, **kwargs):
             print(f"Network request failed (Attempt {attempt}/{config.MAX_RETRIES}): {e}")
             if attempt < config.MAX_RETRIES:
                 print(f"Retrying in {config.RETRY_INTERVAL} seconds...")
-                for _ in tqdm.tqdm(
-                    range(config.RETRY_INTERVAL),
-                    desc="Waiting to retry connection",
-                    unit="s"
-                ):
-                    time.sleep(1)
+                time.sleep(config.RETRY_INTERVAL)
             else:
                 print(
                     f"Tried connecting {attempt} times. Exceeded maximum number of retries. "
@@ -52,8 +95,20 @@ def _make_request_with_retry(http_method, url, **kwargs):
                 )
                 raise e
 
+@functools.lru_cache(maxsize=8)
 def negotiate_formats(predictor_url):
-    """Gets formats from predictor and negotiates the ones to use."""
+    """
+    Gets formats from predictor and negotiates the ones to use.
+
+    Cached per predictor_url: when run_evaluator is invoked repeatedly in a
+    batch, only the first call pays the /formats round-trip. Everything
+    negotiated - including the Content-Encoding - is part of the returned
+    tuple, so cache hits carry the right settings for their URL.
+
+    Returns:
+        (request_fmt, response_fmt, content_encoding): the negotiated MIME
+        types plus "blosc2" or None for the request body encoding.
+    """
     formats_url = f"{predictor_url}/formats"
     print(f"--- Negotiating formats with Predictor at {formats_url} ---")
 
@@ -91,12 +146,22 @@ def negotiate_formats(predictor_url):
         if config.RESPONSE_FORMAT != "application/json":
             print(f"WARNING: RESPONSE_FORMAT='{config.RESPONSE_FORMAT}' not supported by Predictor; Using JSON")
     
+    # Decide whether the POST body can be compressed: only if the Predictor
+    # explicitly advertises blosc2 support
+    pred_encodings = [e.lower() for e in supported.get("predictor_supported_encodings", [])]
+    if "blosc2" in pred_encodings:
+        negotiated_content_enc = "blosc2"
+        print("Predictor supports blosc2-compressed request bodies")
+    else:
+        negotiated_content_enc = None
+
     print(f"Negotiated Request Format: {negotiated_request_fmt}")
     print(f"Negotiated Response Format: {negotiated_response_fmt}")
-    return negotiated_request_fmt, negotiated_response_fmt
+    return negotiated_request_fmt, negotiated_response_fmt, negotiated_content_enc
 
 
-def get_predictions(predictor_url, data_dict, negotiated_req_fmt, negotiated_resp_fmt):
+def get_predictions(predictor_url, data_dict, negotiated_req_fmt, negotiated_resp_fmt,
+                    content_encoding=None):
     """Posts the data to the predictor and returns the deserialized response."""
     predict_url = f"{predictor_url}/predict"
     
@@ -107,18 +172,73 @@ def get_predictions(predictor_url, data_dict, negotiated_req_fmt, negotiated_res
 
     print(f"Serializing request as '{negotiated_req_fmt}'")
     if negotiated_req_fmt == "application/msgpack":
-        payload_bytes = msgpack.packb(data_dict, use_bin_type=True)
+        # Integer-encode the DNA strings for the binary format only; a JSON
+        # predictor keeps receiving the plain strings it expects
+        if "sequences" in data_dict:
+            data_dict = dict(
+                data_dict,
+                sequences={k: encode_seq(s) if isinstance(s, str) else s
+                           for k, s in data_dict["sequences"].items()}
+            )
+        # Encode directly into the reused buffer and hand requests the
+        # bytearray itself - no intermediate bytes copy. Do NOT wrap it in
+        # a memoryview: the view escapes as response.request.body, and a
+        # live buffer export makes the next encode_into fail with
+        # BufferError when it tries to resize the bytearray.
+        _msgpack_encoder.encode_into(data_dict, _SEND_BUF)
+        payload_bytes = _SEND_BUF
     else:
         payload_bytes = json.dumps(data_dict).encode("utf-8")
 
+    if content_encoding == "blosc2":
+        # DNA payloads sit at ~2 bits/byte entropy, so ZSTD at clevel 5
+        # shrinks the body ~3-4x while compressing at GB/s; shuffle filters
+        # are pointless for ASCII so they stay off
+        print("Compressing request body with blosc2/zstd")
+        payload_bytes = blosc2.compress2(
+            payload_bytes, codec=blosc2.Codec.ZSTD, clevel=5,
+            filters=[blosc2.Filter.NOFILTER]
+        )
+        headers["Content-Encoding"] = "blosc2"
+
+    # Set Content-Length explicitly so requests does not fall back to
+    # chunked transfer encoding for the buffered body
+    headers["Content-Length"] = str(len(payload_bytes))
+
     print(f"--- Posting {len(payload_bytes)} bytes to {predict_url} ---")
-    
+
+    # stream=True so the response body can be decoded straight off the
+    # socket instead of being materialized in memory first
     response = _make_request_with_retry(
-        'post', predict_url, 
-        headers=headers, data=payload_bytes)
+        'post', predict_url,
+        headers=headers, data=payload_bytes, stream=True)
     
     return response
 
+def deserialize_msgpack_file(path):
+    """
+    Decodes a msgpack-numpy body that was already streamed to disk.
+
+    Used by the save-and-forward path in evaluator_RestAPI: the raw bytes
+    on disk ARE the artifact to keep, so decoding from the file avoids ever
+    re-serializing the payload. Decode failures are reported as ValueError
+    (matching deserialize_response) and the corrupt file is removed rather
+    than left behind in the output directory.
+    """
+    try:
+        with open(path, 'rb') as f:
+            for obj in msgpack.Unpacker(f, raw=False, max_buffer_size=0,
+                                        object_hook=m.decode):
+                # The payload is a single top-level object
+                return obj
+        error = "empty msgpack body"
+    except msgpack.exceptions.UnpackException as e:
+        error = e
+    # Don't leave a corrupt/truncated .part file in output_dir
+    os.remove(path)
+    print(f"Failed to decode response from Predictor: {error}", file=sys.stderr)
+    raise ValueError(f"Failed to decode predictor response: {error}")
+
 #This function has been edited so that this Evaluator can handle msgpack-numpy
 def deserialize_response(response, negotiated_resp_fmt):
     """Safely deserializes a response object based on its Content-Type."""
@@ -140,12 +260,24 @@ def deserialize_response(response, negotiated_resp_fmt):
         try:
             if "application/msgpack" in response_fmt_actual or "application/msgpack-numpy" in response_fmt_actual:
                 print(f"De-serializing Predictor response as MsgPack/MspPack-numpy")
-                return msgpack.unpackb(response.content, raw=False)
+                if "msgpack-numpy" in response_fmt_actual:
+                    # msgpack-numpy payloads use object-hook encoding, so the
+                    # numpy decode hook is passed explicitly. Stream-decode
+                    # from the raw socket so unpacking overlaps with the TCP
+                    # receive instead of buffering the whole body first.
+                    response.raw.decode_content = True
+                    for obj in msgpack.Unpacker(response.raw, raw=False,
+                                                max_buffer_size=0,
+                                                object_hook=m.decode):
+                        # The payload is a single top-level object
+                        return obj
+                    raise ValueError("Empty msgpack response body from Predictor")
+                return _msgpack_decoder.decode(response.content)
             else:
                 # Default to JSON, which handles success and error payloads
                 print(f"De-serializing Predictor response as JSON")
                 return response.json()
-        except (json.JSONDecodeError, msgpack.exceptions.UnpackException) as e:
+        except (json.JSONDecodeError, msgpack.exceptions.UnpackException, msgspec.DecodeError) as e:
             print(f"Failed to decode response from Predictor: {e}", file=sys.stderr)
             # Raise a specific error type that the main block can catch
             raise ValueError(f"Failed to decode predictor response: {e}") from e   